@@ -7,6 +7,7 @@
 import numpy as np
 np.set_printoptions(formatter={'float': '{: 0.4f}'.format})
 from toolbox import geometry as geom
+from fast_geometry import euclid_distance_sq_2d, swath_quad_strip, bicycle_step
 from shapely.geometry import Polygon, LineString, MultiLineString
 
 
@@ -39,6 +40,8 @@ class AUV(object):
         self.forward_speed = forward_speed
         self.auv_length = auv_length
         self.max_turn_angle = max_turn_angle
+        # _move clamps against this every tick, convert once
+        self._max_turn_rad = np.deg2rad(max_turn_angle)
 
         self._pose_trace = []
         # for each pose, are we doing coverage?
@@ -52,6 +55,10 @@ class AUV(object):
         # keep track of how much we moved for later analysis and drift calcs
         self.distances_traveled = [0]
 
+        # coverage polygons are expensive to build, remember them
+        # keyed on the params and the trace length they were built from
+        self._coverage_poly_cache = {}
+
 
     def __str__(self):
         return f'[auv:{self.auv_id}@{self.pose}]'
@@ -67,7 +74,7 @@ class AUV(object):
 
     @property
     def total_distance_traveled(self):
-        return sum(self.distances_traveled)
+        return float(np.sum(self.distances_traveled))
 
 
     @property
@@ -75,8 +82,9 @@ class AUV(object):
         if self.target_pos is None or self.pos is None:
             return False
 
-        dist = geom.euclid_distance(self.target_pos, self.pos)
-        if dist <= self.target_threshold:
+        dist2 = euclid_distance_sq_2d(self.target_pos[0], self.target_pos[1],
+                                      self.pos[0], self.pos[1])
+        if dist2 <= self.target_threshold**2:
             return True
 
         return False
@@ -128,14 +136,11 @@ class AUV(object):
                 return None, 0
 
         # if they ARE given, just execute them
-        max_turn = np.deg2rad(self.max_turn_angle)
-        steering_angle = turn_direction * min(max_turn, abs(turn_amount))
+        steering_angle = turn_direction * min(self._max_turn_rad, abs(turn_amount))
 
-        # simple  motion model
-        beta = np.arctan2(np.tan(steering_angle), 2)
-        dx = dt * self.forward_speed * np.cos(self.heading + beta)
-        dy = dt * self.forward_speed * np.sin(self.heading + beta)
-        dh = dt * self.forward_speed * np.tan(steering_angle) * np.cos(beta) / self.auv_length
+        # simple  motion model, all the scalar trig in one jitted kernel
+        dx, dy, dh = bicycle_step(self.heading, self.forward_speed,
+                                  self.auv_length, steering_angle, dt)
 
         total_dx = dx + drift_x
         total_dy = dy + drift_y
@@ -186,8 +191,15 @@ class AUV(object):
         # and then displace it with pose trace position
         if pg is None:
             t = self.pose_trace
+            # stats and visualization both ask for these after the run,
+            # only build them once per (params, trace) combination
+            cache_key = (swath, shapely, beam_radius, len(self._pose_trace))
+            cached = self._coverage_poly_cache.get(cache_key)
+            if cached is not None:
+                return cached
         else:
             t = pg.odom_pose_trace
+            cache_key = None
 
         disjoints = [[]]
         for i, covering in enumerate(self._coverage_trace):
@@ -201,18 +213,11 @@ class AUV(object):
             if len(t) < 2:
                 continue
 
-            t = np.array(t)
+            t = np.asarray(t, dtype=float)
             if not shapely:
-                len_trace = len(t)
-                right_swath = np.array([[0,-swath/2]]*len_trace)
-                left_swath = np.array([[0,swath/2]]*len_trace)
-                left_swath = geom.vec2_rotate(left_swath, t[:,2])
-                right_swath = geom.vec2_rotate(right_swath, t[:,2])
-                left_swath[:,0] += t[:,0]
-                left_swath[:,1] += t[:,1]
-                right_swath[:,0] += t[:,0]
-                right_swath[:,1] += t[:,1]
-                poly = np.vstack((right_swath, np.flip(left_swath, axis=0)))
+                # jitted kernel builds the whole quad strip in one pass
+                # instead of stacking/rotating/flipping temporaries
+                poly = swath_quad_strip(t, swath)
                 polies.append(poly)
             else:
                 split = 50
@@ -227,6 +232,9 @@ class AUV(object):
                                        cap_style = 2)
                 polies.append(poly)
 
+        if cache_key is not None:
+            self._coverage_poly_cache[cache_key] = polies
+
         return polies
 
 
@@ -285,7 +293,7 @@ if __name__ == '__main__':
     print(f"Update rate:{i/(t1-t0)} updates per sec.")
 
     import matplotlib.pyplot as plt
-    from descartes import PolygonPatch
+    from plot_tools import polygon_patch
     try:
         __IPYTHON__
         plt.ion()
@@ -304,7 +312,7 @@ if __name__ == '__main__':
 
     spolies = auv.coverage_polygon(swath=5, shapely=True)
     for spoly in spolies:
-        ax.add_patch(PolygonPatch(spoly, fc='r', ec='r', alpha=0.1))
+        ax.add_patch(polygon_patch(spoly, fc='r', ec='r', alpha=0.1))
 
 
 
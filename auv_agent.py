@@ -7,25 +7,121 @@ import matplotlib.pyplot as plt
 plt.rcParams['pdf.fonttype'] = 42
 import numpy as np
 import dubins
+import math
 import time
-from descartes import PolygonPatch
+import os
+from array import array
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor
 from shapely.ops import unary_union
-from shapely.geometry import Polygon, Point
+from shapely.geometry import Polygon
 import matplotlib.patches as pltpatches
 
 from toolbox import geometry as geom
+from fast_geometry import euclid_distance_2d, euclid_distance_sq_2d
+from plot_tools import polygon_patch
 from auv import AUV
 from mission_plan import TimedWaypoint, MissionPlan
 from pose_graph import PoseGraph, PGO_VertexIdStore
 
 
+# sampled dubins paths, keyed on the goal pose in the start frame.
+# dubins paths are invariant under rigid transforms, so translated and
+# rotated copies of the same manoeuvre (parallel lawnmower lanes flown by
+# different agents) all share one cache entry; the canonical samples are
+# transformed back into the world frame per request
+_dubins_sample_cache = {}
+
+def sample_dubins_path(q0, q1, turning_rad, step=0.5):
+    # scalar trig through math, the numpy ufunc wrapper is pure overhead
+    # on single floats
+    c = math.cos(-q0[2])
+    s = math.sin(-q0[2])
+    dx = q1[0] - q0[0]
+    dy = q1[1] - q0[1]
+    rx = c*dx - s*dy
+    ry = s*dx + c*dy
+    rth = (q1[2] - q0[2]) % (2*np.pi)
+    key = (round(rx, 2), round(ry, 2), round(rth, 3), turning_rad, step)
+    pts = _dubins_sample_cache.get(key)
+    if pts is None:
+        path = dubins.shortest_path((0., 0., 0.),
+                                    (rx, ry, rth),
+                                    turning_rad)
+        # sample_many is the bulk sampling API dubins offers; turn its
+        # point list into one contiguous float array here, once per
+        # unique plan, so the followers only ever touch ndarray rows
+        pts, times = path.sample_many(step)
+        pts = np.array(pts, dtype=float)
+        # shared between agents, nobody gets to scribble on it
+        pts.setflags(write=False)
+        if len(_dubins_sample_cache) > 2048:
+            _dubins_sample_cache.clear()
+        _dubins_sample_cache[key] = pts
+
+    # rigid-transform the canonical samples into the world frame
+    c = math.cos(q0[2])
+    s = math.sin(q0[2])
+    out = np.empty(pts.shape)
+    out[:,0] = q0[0] + c*pts[:,0] - s*pts[:,1]
+    out[:,1] = q0[1] + s*pts[:,0] + c*pts[:,1]
+    out[:,2] = pts[:,2] + q0[2]
+    return out
+
+
+try:
+    # shapely 2.0 iterates the geometries in C, noticeably faster than
+    # ops.unary_union on long lists
+    from shapely import union_all as _union_all
+except ImportError:
+    _union_all = unary_union
+
+
+def batched_unary_union(polies, chunk_size=64):
+    # union in chunks and then union the chunk results, so that GEOS
+    # works on balanced merges instead of one giant flat list
+    if len(polies) <= chunk_size:
+        return _union_all(polies)
+    chunks = [_union_all(polies[i:i+chunk_size])
+              for i in range(0, len(polies), chunk_size)]
+    return batched_unary_union(chunks, chunk_size)
+
+
+class _PointBuffer(object):
+    # growable (n,3) float buffer for the viz point logs. appending
+    # writes into preallocated storage and visualization reads a view,
+    # instead of a list of pose tuples converted at plot time
+    def __init__(self, cap=256):
+        self._buf = np.empty((cap, 3))
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    def __iter__(self):
+        return iter(self._buf[:self._n])
+
+    def append(self, pose):
+        if self._n >= len(self._buf):
+            grown = np.empty((len(self._buf)*2, 3))
+            grown[:self._n] = self._buf[:self._n]
+            self._buf = grown
+        self._buf[self._n] = pose
+        self._n += 1
+
+    @property
+    def points(self):
+        return self._buf[:self._n]
+
+
 class Agent(object):
     COLORS = ['red', 'blue', 'green', 'purple', 'orange', 'cyan']
     def __init__(self,
                  real_auv,
                  pose_graph,
                  mission_plan,
-                 drift_model = None):
+                 drift_model = None,
+                 rng = None):
 
         # a reference to the actual physical auv
         # for ceonvenience
@@ -41,6 +137,28 @@ class Agent(object):
         self.mission_plan = mission_plan
         self.drift_model = drift_model
 
+        # noise draws come from a Generator owned by the mission, so
+        # parallel missions never race on the legacy np.random global.
+        # standalone agents make their own
+        if rng is None:
+            rng = np.random.default_rng()
+        self._rng = rng
+
+        # config values used every single tick, read them out of the
+        # dict once instead of dict-hopping in the hot loop
+        self._comm_range = mission_plan.config['comm_range']
+        self._landmark_range = mission_plan.config['landmark_range']
+        self._turning_rad = mission_plan.config['turning_rad']
+        self._drift_trans_k = mission_plan.config['uncertainty_accumulation_rate_k']
+        self._heading_noise_degrees = mission_plan.config['heading_noise_degrees']
+        self._heading_noise_rad = math.radians(self._heading_noise_degrees)
+
+        # squared arrival thresholds, compared against every tick.
+        # target_threshold is set once at construction, so these are
+        # constants for the lifetime of the agent
+        self._tgt_thr2 = real_auv.target_threshold**2
+        self._near_thr2 = (real_auv.target_threshold + 0.5)**2
+
         # this auv model will be used to create the pose graph from
         # noisy measurements of the real auv
         self.internal_auv = AUV(auv_id = real_auv.auv_id,
@@ -58,17 +176,30 @@ class Agent(object):
 
         # to keep track of when we were connected to another auv
         # so that we can optimize the PG when we disconnect
-        self.connection_trace = []
+        # preallocated bool buffer with a cursor, doubled when full,
+        # instead of a per-tick python append
+        self._conn = np.zeros(4096, dtype=np.bool_)
+        self._conn_i = 0
+
+        # debounce for the optimization trigger: a new connection state
+        # must hold this many ticks before we call it a real edge,
+        # otherwise agents grazing the comm range optimize every tick
+        self._optimize_hysteresis_ticks = 5
+        self._stable_connection_state = False
+        self._pending_connection_state = None
+        self._pending_state_ticks = 0
 
         # keep a record of how many vertices and edges we received through "fill_in_since_last_interaction"
         # clock, num list
         self.received_data = {'verts':[(0.,0.)],
                               'edges':[(0.,0.)]}
 
-        # list of distances between real auv and internal auv (time,err)
-        self.real_errors = []
-        # list of distances the real auv moved
-        self.real_moved_dists = []
+        # per-tick distance between real auv and internal auv, and
+        # distance the real auv moved, as flat scalar arrays sharing one
+        # time axis instead of millions of (time, value) tuples
+        self.tick_times = array('d')
+        self.real_errors = array('d')
+        self.real_moved_dists = array('d')
         # keep track of how much our error drops after optimizing (time,drop)
         self.position_error_drops = []
         # list of current_time - wp.time
@@ -78,12 +209,23 @@ class Agent(object):
         # generated by a dubins path planner
         # we need to give these one by one to the auv
         # and re-calculate the path plan when we reach a mission wp
+        # the points are a fixed array, the cursor below indexes into it
         self.current_dubins_points = []
+        self._dubins_idx = 0
+
+        # the current wp only changes on the rare visit_current_wp call,
+        # so cache it instead of walking the mission plan every tick
+        self._cached_wp = None
+        self._cached_wp_stale = True
 
         # some visualization data
-        self.viz_plan_points = []
-        self.viz_optim_points = []
-        self.viz_waited_points = []
+        self.viz_plan_points = _PointBuffer()
+        self.viz_optim_points = _PointBuffer()
+        # waited points pile up every single tick an agent sits still,
+        # so only keep every k'th sample, a plot doesnt need 20Hz dots
+        self.viz_waited_points = _PointBuffer()
+        self._waited_viz_decimation = 20
+        self._waited_viz_counter = 0
         self.color = Agent.COLORS[self.id%len(Agent.COLORS)]
 
 
@@ -101,7 +243,40 @@ class Agent(object):
         print(f'[AGNT:{self.pg.pg_id}]\t{args}')
 
 
-    def update(self, dt, all_agents, landmarks=None):
+    def _reset_dubins_plan(self):
+        # drop the current plan and rewind the cursor, the next update
+        # will plan (or fetch from cache) a fresh path
+        self.current_dubins_points = []
+        self._dubins_idx = 0
+
+    @property
+    def connection_trace(self):
+        # the filled part of the buffer
+        return self._conn[:self._conn_i]
+
+    def _record_connection(self, connected):
+        if self._conn_i >= len(self._conn):
+            grown = np.zeros(len(self._conn)*2, dtype=np.bool_)
+            grown[:self._conn_i] = self._conn
+            self._conn = grown
+        self._conn[self._conn_i] = connected
+        self._conn_i += 1
+
+    def _cur_wp(self):
+        # memoized mission_plan.get_current_wp, refreshed only after a
+        # _visit_wp invalidated it
+        if self._cached_wp_stale:
+            self._cached_wp = self.mission_plan.get_current_wp(self.id)
+            self._cached_wp_stale = False
+        return self._cached_wp
+
+    def _visit_wp(self):
+        self.mission_plan.visit_current_wp(self.id)
+        self._cached_wp_stale = True
+
+
+    def update(self, dt, all_agents, landmarks=None,
+               comm_row=None, lm_row=None):
         # update internal auv
         # apply the same control to real auv, with enviromental noise
         # measure real auv (heading?), apply onto internal auv
@@ -118,18 +293,20 @@ class Agent(object):
 
         ### MISSION SYNC
         at_target = False
-        current_timed_wp = self.mission_plan.get_current_wp(self.id)
+        current_timed_wp = self._cur_wp()
         if current_timed_wp is None:
-            self.mission_plan.visit_current_wp(self.id)
-            current_timed_wp = self.mission_plan.get_current_wp(self.id)
+            self._visit_wp()
+            current_timed_wp = self._cur_wp()
             if current_timed_wp is None:
                 # this agent is 'done', the mission plan is out of WPs
                 # do nothing
                 return
-            dist = geom.euclid_distance(self.internal_auv.pose[:2], current_timed_wp.pose[:2])
+            dist2 = euclid_distance_sq_2d(self.internal_auv.pose[0], self.internal_auv.pose[1],
+                                          current_timed_wp.pose[0], current_timed_wp.pose[1])
         else:
-            dist = geom.euclid_distance(self.internal_auv.pose[:2], current_timed_wp.pose[:2])
-            at_target = dist <= self.internal_auv.target_threshold
+            dist2 = euclid_distance_sq_2d(self.internal_auv.pose[0], self.internal_auv.pose[1],
+                                          current_timed_wp.pose[0], current_timed_wp.pose[1])
+            at_target = dist2 <= self._tgt_thr2
             rendezvous_happened = current_timed_wp.rendezvous_happened and\
                     current_timed_wp.idx_in_pattern in [1,3,5]
             # either at the target, or we can skip the rest of the line because
@@ -141,12 +318,15 @@ class Agent(object):
                 if wp_time_reached or rendezvous_happened:
                     # we have reached the point, and we dont need to wait here
                     # get the next wp
-                    self.mission_plan.visit_current_wp(self.id)
-                    current_timed_wp = self.mission_plan.get_current_wp(self.id)
-                    self.current_dubins_points = []
+                    self._visit_wp()
+                    current_timed_wp = self._cur_wp()
+                    self._reset_dubins_plan()
                 else:
                     # dont move if dont have to
-                    self.viz_waited_points.append(self.internal_auv.pose)
+                    self._waited_viz_counter += 1
+                    if self._waited_viz_counter >= self._waited_viz_decimation:
+                        self._waited_viz_counter = 0
+                        self.viz_waited_points.append(self.internal_auv.pose)
 
         if current_timed_wp is None:
             # this agent is 'done'
@@ -156,30 +336,35 @@ class Agent(object):
         ### PATH PLANNING
         # if the point is far away enough, use dubins. If it is close by, just use
         # simple heading controller of the AUV itself
-        if dist < self.internal_auv.target_threshold + 0.5:
+        if dist2 < self._near_thr2:
             target_posi = current_timed_wp.pose[:2]
         else:
             # first check if we already have a dubins path planned for this WP
             if self.current_dubins_points is None or len(self.current_dubins_points)==0:
                 # there is no path planned for this WP, plan it now
-                dubins_path = dubins.shortest_path(self.internal_auv.pose,
-                                                   current_timed_wp.pose,
-                                                   self.mission_plan.config['turning_rad'])
-                # sample it and set the path
-                pts, times = dubins_path.sample_many(0.5)
-                self.current_dubins_points = pts
+                # (or re-use a previously sampled identical plan)
+                self.current_dubins_points = sample_dubins_path(self.internal_auv.pose,
+                                                                current_timed_wp.pose,
+                                                                self._turning_rad)
+                self._dubins_idx = 0
                 self.viz_plan_points.append(self.internal_auv.pose)
 
             # we have a path to follow
-            # skip the points that are too close
-            target_posi = self.current_dubins_points[0][:2]
-            while geom.euclid_distance(self.internal_auv.pose[:2], self.current_dubins_points[0][:2]) <= self.internal_auv.target_threshold:
-                if len(self.current_dubins_points) > 1:
-                    self.current_dubins_points = self.current_dubins_points[1:]
-                    # then set the first point of the plan as the auvs target
-                    target_posi = self.current_dubins_points[0][:2]
-                else:
-                    break
+            # skip the points that are too close by advancing a cursor into
+            # the fixed array instead of popping the front of a list
+            pts = self.current_dubins_points
+            px, py = self.internal_auv.pose[0], self.internal_auv.pose[1]
+            dx = pts[self._dubins_idx:, 0] - px
+            dy = pts[self._dubins_idx:, 1] - py
+            d2 = dx*dx + dy*dy
+            far = d2 > self._tgt_thr2
+            if far.any():
+                # jump ahead to the first point that is not too close
+                self._dubins_idx += int(np.argmax(far))
+            else:
+                # all remaining points are close, keep the last one
+                self._dubins_idx = len(pts) - 1
+            target_posi = pts[self._dubins_idx, :2]
 
 
 
@@ -191,25 +376,33 @@ class Agent(object):
         # if we are alone
         # and there are no landmarks in the vicinity
         # we will drift
-        if landmarks is None:
-            landmarks = []
-        alone = True
-        no_landmarks = True
-        for agent in all_agents+landmarks:
-            # skip self
-            if agent.pg.pg_id == self.pg.pg_id:
-                continue
-            dist = geom.euclid_distance(self._real_auv.pose[:2], agent._real_auv.pose[:2])
-
-            lim = self.mission_plan.config['comm_range']
-            if agent.is_landmark:
-                lim = self.mission_plan.config['landmark_range']
-
-            if dist <= lim:
-                if agent.is_landmark:
-                    no_landmarks = False
-                else:
-                    alone = False
+        if comm_row is None:
+            # no precomputed neighbor graph given (single-agent use),
+            # compute our own contact rows here
+            if landmarks is None:
+                landmarks = []
+            # one chained sweep instead of concatenating a throwaway
+            # list and walking it three times
+            positions = []
+            landmark_flags = []
+            not_self = []
+            for a in chain(all_agents, landmarks):
+                positions.append(a._real_auv.pos)
+                landmark_flags.append(a.is_landmark)
+                not_self.append(a.pg.pg_id != self.pg.pg_id)
+            positions = np.array(positions)
+            landmark_mask = np.array(landmark_flags)
+            not_self = np.array(not_self)
+            diffs = positions - self._real_auv.pos
+            dist2_row = np.sum(diffs*diffs, axis=1)
+            # compare against squared ranges, no sqrt needed anywhere
+            comm_r2 = self._comm_range**2
+            lm_r2 = self._landmark_range**2
+            comm_row = (dist2_row <= comm_r2) & ~landmark_mask & not_self
+            lm_row = (dist2_row <= lm_r2) & landmark_mask
+
+        alone = not comm_row.any()
+        no_landmarks = not lm_row.any()
 
 
 
@@ -221,20 +414,23 @@ class Agent(object):
         # if we are doing coverage work, then we also drift
         moved_dist = self.internal_auv.last_moved_distance
         if cover and alone and self.drift_model is not None:
-            _,_, drift_trans_angle = self.drift_model.sample(self._real_auv.pose[0],
-                                                             self._real_auv.pose[1])
-            drift_trans_k = self.mission_plan.config['uncertainty_accumulation_rate_k']
+            # sample() already returns the normalized drift direction,
+            # meaning the cos/sin of the drift angle computed in its own
+            # vectorized pass. use those instead of redoing the trig here
+            drift_ux, drift_uy, _ = self.drift_model.sample(self._real_auv.pose[0],
+                                                            self._real_auv.pose[1])
+            drift_trans_k = self._drift_trans_k
 
             # if doing coverage, use the given drift model
             # to determine the drifting distance in meters
             # k is in meters per meter. last moved distance is meters, thus drift mag is in meters
             drift_mag = moved_dist * drift_trans_k
-            drift_x = drift_mag * np.cos(drift_trans_angle)
-            drift_y = drift_mag * np.sin(drift_trans_angle)
+            drift_x = drift_mag * drift_ux
+            drift_y = drift_mag * drift_uy
 
-            # add some heading drifting too
-            degree_lim = self.mission_plan.config['heading_noise_degrees']
-            heading_noise = np.deg2rad((np.random.random()*2 -1)*degree_lim)
+            # add some heading drifting too. scalar draw and a single
+            # multiply, no numpy wrapper in the hot loop
+            heading_noise = (self._rng.random()*2 -1) * self._heading_noise_rad
         else:
             drift_x = 0
             drift_y = 0
@@ -264,78 +460,103 @@ class Agent(object):
         self.pg.append_odom_pose(self.internal_auv.apose)
 
         # keep track of errors over the whole thing
-        real_err = geom.euclid_distance(self._real_auv.pose[:2], self.internal_auv.pose[:2])
-        self.real_errors.append((self.time, real_err))
-        self.real_moved_dists.append((self.time, moved_dist))
+        real_err = euclid_distance_2d(self._real_auv.pose[0], self._real_auv.pose[1],
+                                      self.internal_auv.pose[0], self.internal_auv.pose[1])
+        self.tick_times.append(self.time)
+        self.real_errors.append(real_err)
+        self.real_moved_dists.append(moved_dist)
 
 
 
     def communicate(self,
                     all_agents,
-                    summarize_pg=True):
+                    summarize_pg=True,
+                    comm_row=None,
+                    lm_row=None):
 
         recorded = False
-        comm_dist = self.mission_plan.config['comm_range']
-        lm_dist = self.mission_plan.config['landmark_range']
+        comm_dist = self._comm_range
+        lm_dist = self._landmark_range
 
         # quick exit if we are not planned to communicate at all
         if comm_dist > 0:
-            for agent in all_agents:
-                # skip self
-                if agent.id == self.id:
-                    continue
-
-                lim = comm_dist
-                if agent.is_landmark:
-                    lim = lm_dist
-
-                dist = geom.euclid_distance(self._real_auv.pose[:2], agent._real_auv.pose[:2])
-                if dist <= lim:
-                    self.pg.measure_tip_to_tip(self_real_pose = self._real_auv.pose,
-                                               other_real_pose = agent._real_auv.pose,
-                                               other_pg = agent.pg,
-                                               landmark = agent.is_landmark)
-
-                    use_summary = summarize_pg and not agent.is_landmark
-                    num_vs, num_es = self.pg.fill_in_since_last_interaction(agent.pg, use_summary=use_summary)
-                    # if num_vs > 2:
-                        # self.log(f"Got {num_vs} verts from {agent.id}")
-                    self.received_data['verts'].append((self.time, num_vs))
-                    self.received_data['edges'].append((self.time, num_es))
-
-                    # was not connected, just connected
-                    if not recorded:
-                        self.connection_trace.append(True)
-                        recorded = True
+            if comm_row is None:
+                # no precomputed neighbor graph given, compute our own rows
+                positions = np.array([a._real_auv.pos for a in all_agents])
+                landmark_mask = np.array([a.is_landmark for a in all_agents])
+                not_self = np.array([a.id != self.id for a in all_agents])
+                diffs = positions - self._real_auv.pos
+                dist2_row = np.sum(diffs*diffs, axis=1)
+                comm_row = (dist2_row <= comm_dist*comm_dist) & ~landmark_mask & not_self
+                lm_row = (dist2_row <= lm_dist*lm_dist) & landmark_mask
+
+            # within comm range for other agents, landmark range for landmarks
+            for j in np.flatnonzero(comm_row | lm_row):
+                agent = all_agents[j]
+                self.pg.measure_tip_to_tip(self_real_pose = self._real_auv.pose,
+                                           other_real_pose = agent._real_auv.pose,
+                                           other_pg = agent.pg,
+                                           landmark = agent.is_landmark)
+
+                use_summary = summarize_pg and not agent.is_landmark
+                num_vs, num_es = self.pg.fill_in_since_last_interaction(agent.pg, use_summary=use_summary)
+                # if num_vs > 2:
+                    # self.log(f"Got {num_vs} verts from {agent.id}")
+                self.received_data['verts'].append((self.time, num_vs))
+                self.received_data['edges'].append((self.time, num_es))
+
+                # was not connected, just connected
+                if not recorded:
+                    self._record_connection(True)
+                    recorded = True
 
         # is not connected to anyone
         if not recorded:
-            self.connection_trace.append(False)
+            self._record_connection(False)
         else:
             # connected to someone
             # mark this in the waypoint we are going to, if any
             # but only if we are close enough to the wp, to avoid marking
             # it as done due to a random other rendezvous not intended for this wp
-            current_timed_wp = self.mission_plan.get_current_wp(self.id)
+            current_timed_wp = self._cur_wp()
             if current_timed_wp is not None:
-                dist = geom.euclid_distance(self.internal_auv.pose[:2], current_timed_wp.pose[:2])
-                if dist <= current_timed_wp.uncertainty_radius:
+                dist2 = euclid_distance_sq_2d(self.internal_auv.pose[0], self.internal_auv.pose[1],
+                                              current_timed_wp.pose[0], current_timed_wp.pose[1])
+                if dist2 <= current_timed_wp.uncertainty_radius_sq:
                     current_timed_wp.rendezvous_happened = True
 
 
-        # if the connection status has changed, optimize the pose graph etc.
-        if len(self.connection_trace) > 2:
-            if self.connection_trace[-1] != self.connection_trace[-2]:
-                success, corrected_current_pose = self.pg.optimize(use_summary=summarize_pg, save_before=False)
-                if success:
-                    correction_vec = self.internal_auv.apose[:2] - corrected_current_pose[:2]
-                    # self.log(f"Pose correction={correction_vec}")
+        # edge-detect the connection status with hysteresis: only once the
+        # new state has been stable for a few ticks do we optimize
+        connected = bool(self._conn[self._conn_i - 1])
+        edge_detected = False
+        if connected != self._stable_connection_state:
+            if connected != self._pending_connection_state:
+                self._pending_connection_state = connected
+                self._pending_state_ticks = 1
+            else:
+                self._pending_state_ticks += 1
+            if self._pending_state_ticks >= self._optimize_hysteresis_ticks:
+                self._stable_connection_state = connected
+                self._pending_connection_state = None
+                self._pending_state_ticks = 0
+                edge_detected = True
+        else:
+            # state flickered back before it settled, forget the blip
+            self._pending_connection_state = None
+            self._pending_state_ticks = 0
+
+        if edge_detected and self._conn_i > 2:
+            success, corrected_current_pose = self.pg.optimize(use_summary=summarize_pg, save_before=False)
+            if success:
+                correction_vec = self.internal_auv.apose[:2] - corrected_current_pose[:2]
+                # self.log(f"Pose correction={correction_vec}")
 
-                    self.internal_auv.set_pose(corrected_current_pose)
+                self.internal_auv.set_pose(corrected_current_pose)
 
-                    self.viz_optim_points.append(self.internal_auv.pose)
-                    # we should re-plan next update with the correcter est.
-                    self.current_dubins_points = []
+                self.viz_optim_points.append(self.internal_auv.pose)
+                # we should re-plan next update with the correcter est.
+                self._reset_dubins_plan()
 
 
 
@@ -379,7 +600,7 @@ class Agent(object):
         coverage_polies = self._real_auv.coverage_polygon(swath = self.mission_plan.config['swath'],
                                                           shapely=True)
         for poly in coverage_polies:
-            ax.add_artist(PolygonPatch(poly, alpha=0.08, fc=self.color, ec=self.color))
+            ax.add_artist(polygon_patch(poly, alpha=0.08, fc=self.color, ec=self.color))
 
         viz_lists = [
             self.viz_plan_points,
@@ -396,7 +617,7 @@ class Agent(object):
                     ax.scatter(x,y,c=self.color, marker='x', alpha=0.5)
 
         if len(self.viz_waited_points) > 0:
-            p = np.array(self.viz_waited_points)
+            p = self.viz_waited_points.points
             ax.scatter(p[:,0], p[:,1], alpha=0.5, c=self.color, marker='o')
 
 
@@ -408,9 +629,12 @@ class RunnableMission:
         seed,
         mplan,
         drift_model,
-        use_summary = True
+        use_summary = True,
+        parallel_updates = False
     ):
-        np.random.seed(seed)
+        # one seeded Generator per mission instead of the legacy global
+        # singleton, shared by all the agents of this mission
+        self.rng = np.random.default_rng(seed)
         self.pg_id_store = PGO_VertexIdStore()
 
         self.seed = seed
@@ -437,14 +661,24 @@ class RunnableMission:
         # enable or disable pose graph summarization for the mission
         self.use_summary = use_summary
 
+        # run the per-agent update pass in a thread pool when there are
+        # many agents. threads rather than processes, since agents share
+        # the mission plan and the pose graphs
+        self.parallel_updates = parallel_updates
+
+        # all the initial poses in two vectorized trig calls instead of
+        # a pair of scalar cos/sin per agent
+        init_poses = np.array([tp.wps[0].pose for tp in mplan.timed_paths])
+        init_headings = init_poses[:, 2]
+        init_heading_vecs = np.stack([np.cos(init_headings),
+                                      np.sin(init_headings)], axis=1)
+        # start _juuuust_ a little behind to cover the very very beginning
+        init_positions = init_poses[:, :2] - init_heading_vecs*0.5
+
         for i, timed_path in enumerate(mplan.timed_paths):
-            init_heading = timed_path.wps[0].pose[2]
-            init_heading_vec = np.array([np.cos(init_heading), np.sin(init_heading)])
-            # start _juuuust_ a little behind to cover the very very beginning
-            init_pos = timed_path.wps[0].pose[:2] - init_heading_vec*0.5
             auv = AUV(auv_id = i,
-                      init_pos = init_pos,
-                      init_heading = np.rad2deg(init_heading),
+                      init_pos = init_positions[i],
+                      init_heading = math.degrees(init_headings[i]),
                       target_threshold = 2,
                       forward_speed = mplan.config['speed'])
 
@@ -454,7 +688,8 @@ class RunnableMission:
             agent = Agent(real_auv = auv,
                           pose_graph = pg,
                           mission_plan = mplan,
-                          drift_model = drift_model)
+                          drift_model = drift_model,
+                          rng = self.rng)
 
             self.agents.append(agent)
 
@@ -496,27 +731,126 @@ class RunnableMission:
         landmarks = self.landmarks
         dt = self.dt
         mplan = self.mplan
+        last_planned_time = mplan.last_planned_time
 
         prev_print_time = 0
         start_time = time.time()
 
+        # agents first, then landmarks, so that an agents id is its index
+        everyone = agents + landmarks
+        landmark_mask = np.array([a.is_landmark for a in everyone])
+        comm_r2 = mplan.config['comm_range']**2
+        lm_r2 = mplan.config['landmark_range']**2
+
+        # with comms disabled and no landmarks around, nobody can ever
+        # be in contact, so skip the distance matrix entirely
+        no_contact_possible = mplan.config['comm_range'] <= 0 and len(landmarks) == 0
+        never_contacts = np.zeros((len(everyone), len(everyone)), dtype=bool)
+
+        # the dense distance matrix is quadratic in the mission size. for
+        # big fleets bucket everyone into a uniform grid with cells the
+        # size of the largest contact range, then each agent only checks
+        # the 3x3 cell neighborhood around itself instead of everybody
+        grid_cell = max(mplan.config['comm_range'], mplan.config['landmark_range'])
+        use_grid = len(everyone) >= 64 and grid_cell > 0
+        comm_buf = np.zeros((len(everyone), len(everyone)), dtype=bool)
+        lm_buf = np.zeros((len(everyone), len(everyone)), dtype=bool)
+
+        # one shared position table for everything in the mission.
+        # landmark rows never change, so they are written exactly once
+        # and only the agent rows get refreshed per tick
+        positions = np.empty((len(everyone), 2))
+        for i, a in enumerate(everyone):
+            positions[i] = a._real_auv.pos
+        num_agents = len(agents)
+
+        # only worth spinning up threads when there are enough agents to
+        # amortize the pool overhead. communicate stays serial since it
+        # mutates the shared pose graphs
+        executor = None
+        if self.parallel_updates and len(agents) >= 8:
+            executor = ThreadPoolExecutor(max_workers=min(len(agents), os.cpu_count() or 1))
+
+        # defined once here instead of per tick; reads the contact masks
+        # of the current tick through the closure
+        def update_one(agent):
+            agent.update(dt = dt,
+                         all_agents = agents,
+                         landmarks = landmarks,
+                         comm_row = comm_contacts[agent.id],
+                         lm_row = lm_contacts[agent.id])
+
+        # bind the communicate methods once, no per-tick attribute
+        # resolution. the two passes stay separate on purpose: every
+        # agent must finish moving before anyone measures anyone else,
+        # otherwise who-saw-what depends on the agent order
+        use_summary = self.use_summary
+        comms = [(a.communicate, a.id) for a in agents]
+
         # run the agents
         while True:
             step += 1
-            for agent in agents:
-                agent.update(dt = dt,
-                             all_agents = agents,
-                             landmarks = landmarks)
-
-            for agent in agents:
-                agent.communicate(all_agents = agents+landmarks,
-                                  summarize_pg = self.use_summary)
+            if no_contact_possible:
+                comm_contacts = never_contacts
+                lm_contacts = never_contacts
+            else:
+                # refresh the shared position table in place
+                # AUV.pos is the live ndarray of the position, no slicing needed
+                for i in range(num_agents):
+                    positions[i] = agents[i]._real_auv.pos
+
+                if use_grid:
+                    # coarse bucketing, only measure against the agents
+                    # and landmarks in the surrounding cells
+                    comm_buf[:num_agents] = False
+                    lm_buf[:num_agents] = False
+                    cells = np.floor_divide(positions, grid_cell).astype(np.int64)
+                    buckets = {}
+                    for i in range(len(everyone)):
+                        buckets.setdefault((cells[i, 0], cells[i, 1]), []).append(i)
+                    for i in range(num_agents):
+                        cx, cy = cells[i, 0], cells[i, 1]
+                        cand = []
+                        for ox in (-1, 0, 1):
+                            for oy in (-1, 0, 1):
+                                cand += buckets.get((cx+ox, cy+oy), [])
+                        cand = np.asarray(cand)
+                        diffs = positions[cand] - positions[i]
+                        d2 = np.einsum('ij,ij->i', diffs, diffs)
+                        in_lm = landmark_mask[cand]
+                        comm_buf[i, cand] = (d2 <= comm_r2) & ~in_lm
+                        comm_buf[i, i] = False
+                        lm_buf[i, cand] = (d2 <= lm_r2) & in_lm
+                    comm_contacts = comm_buf
+                    lm_contacts = lm_buf
+                else:
+                    # small mission, the full squared-distance matrix is
+                    # cheaper than any bucketing bookkeeping
+                    diffs = positions[:, None, :] - positions[None, :, :]
+                    # einsum contracts in one pass, no squared (N,N,2) temporary
+                    D2 = np.einsum('ijk,ijk->ij', diffs, diffs)
+                    comm_contacts = (D2 <= comm_r2) & ~landmark_mask[None, :]
+                    np.fill_diagonal(comm_contacts, False)
+                    lm_contacts = (D2 <= lm_r2) & landmark_mask[None, :]
+
+            if executor is not None:
+                # consume the iterator so exceptions propagate
+                list(executor.map(update_one, agents))
+            else:
+                for agent in agents:
+                    update_one(agent)
+
+            for communicate, aid in comms:
+                communicate(all_agents = everyone,
+                            summarize_pg = use_summary,
+                            comm_row = comm_contacts[aid],
+                            lm_row = lm_contacts[aid])
 
             if mplan.is_complete:
                 self.log("Plan completed")
                 break
 
-            if step*dt >= mplan.last_planned_time:
+            if step*dt >= last_planned_time:
                 self.log("Max planned time reached")
                 break
 
@@ -529,15 +863,18 @@ class RunnableMission:
                     estimate = '-'
                 else:
                     rate = sim_time / elapsed
-                    remaining = mplan.last_planned_time - sim_time
+                    remaining = last_planned_time - sim_time
                     estimate = remaining / rate
 
-                self.log(f"sim time={int(sim_time)}/{int(mplan.last_planned_time)}s "+
+                self.log(f"sim time={int(sim_time)}/{int(last_planned_time)}s "+
                          f"real time={int(elapsed)}s "+
                          f"rate={int(rate)}s/s "+
                          f"estimated remaining={int(estimate)}s")
                 prev_print_time = time.time()
 
+        if executor is not None:
+            executor.shutdown()
+
         self.calculate_stats()
         self.log("Run complete")
 
@@ -550,16 +887,22 @@ class RunnableMission:
             coverage_polies = agent._real_auv.coverage_polygon(swath = self.mplan.config['swath']+1,
                                                                shapely = True,
                                                                beam_radius = 1.5)
-            all_polies += coverage_polies
-
-            times, errs = zip(*agent.real_errors)
-            times, dists = zip(*agent.real_moved_dists)
-            distances_traveled = np.cumsum(dists)
-            errs = errs / (distances_traveled+0.000001)
+            # pre-merge per agent so the final union sees one geometry
+            # per agent instead of every disjoint swath piece
+            if len(coverage_polies) > 0:
+                all_polies.append(_union_all(coverage_polies))
+
+            # the per-tick logs are flat scalar arrays already,
+            # the accumulation and division is all vectorized
+            times = np.asarray(agent.tick_times)
+            distances_traveled = np.cumsum(np.asarray(agent.real_moved_dists))
+            # nudge in place to avoid div-by-zero, no extra temporary
+            distances_traveled += 0.000001
+            errs = np.asarray(agent.real_errors) / distances_traveled
             self.all_translational_errs.append((times, errs))
             if len(agent.position_error_drops) > 0:
-                times, drops = zip(*agent.position_error_drops)
-                self.all_error_drops.append((times, drops))
+                drop_arr = np.asarray(agent.position_error_drops)
+                self.all_error_drops.append((drop_arr[:, 0], drop_arr[:, 1]))
 
         w, h = self.mplan.config['rect_width'], self.mplan.config['rect_height']
         area_poly = Polygon(shell=[
@@ -569,20 +912,18 @@ class RunnableMission:
             (0,h),
             (0,0)
         ])
-        self.covered_poly = unary_union(all_polies)
+        self.covered_poly = batched_unary_union(all_polies)
         self.missed_poly = area_poly - self.covered_poly
 
 
         def get_lenwidth(poly):
-            area = poly.area
             rect = poly.minimum_rotated_rectangle
-            x,y = rect.exterior.coords.xy
-            len01 = Point(x[0], y[0]).distance(Point(x[1], y[1]))
-            len12 = Point(x[1], y[1]).distance(Point(x[2], y[2]))
-            edge_lens = (len01, len12)
-            rect_len = max(edge_lens)
-            rect_width = min(edge_lens)
-            return (rect_len, rect_width)
+            # two adjacent edges of the rectangle, straight ndarray math
+            # instead of constructing shapely Points just to measure
+            coords = np.asarray(rect.exterior.coords)[:3]
+            edges = np.diff(coords, axis=0)
+            edge_lens = np.hypot(edges[:,0], edges[:,1])
+            return (float(edge_lens.max()), float(edge_lens.min()))
 
 
         if self.missed_poly.area > 0:
@@ -595,7 +936,7 @@ class RunnableMission:
 
         total_travel = sum([agent._real_auv.total_distance_traveled for agent in self.agents])
         total_time = len(self.agents) * self.mplan.last_planned_time
-        final_errors = [float(agent.real_errors[-1][1]) for agent in self.agents]
+        final_errors = [float(agent.real_errors[-1]) for agent in self.agents]
 
         self.results = {
             'missed_area':self.missed_poly.area,
@@ -623,7 +964,7 @@ class RunnableMission:
             lm.visualize(ax)
 
         if self.missed_poly.area > 0:
-            ax.add_artist(PolygonPatch(self.missed_poly, alpha=1, fc='red', ec='black'))
+            ax.add_artist(polygon_patch(self.missed_poly, alpha=1, fc='red', ec='black'))
 
 
     def plot_errors(self):
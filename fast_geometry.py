@@ -0,0 +1,128 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+
+# hot scalar math that gets called tens of thousands of times per
+# simulated second. jitted with numba when its available, otherwise
+# plain python so the sim still runs without it
+
+import math
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        # numba not installed, leave the functions as plain python
+        def wrap(func):
+            return func
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return wrap
+
+
+@njit(cache=True, fastmath=True)
+def euclid_distance_2d(ax, ay, bx, by):
+    dx = ax - bx
+    dy = ay - by
+    return math.sqrt(dx*dx + dy*dy)
+
+
+@njit(cache=True, fastmath=True)
+def bicycle_step(heading, forward_speed, auv_length, steering_angle, dt):
+    # one tick of the bicycle motion model
+    # returns the position and heading deltas
+    beta = math.atan2(math.tan(steering_angle), 2.0)
+    dx = dt * forward_speed * math.cos(heading + beta)
+    dy = dt * forward_speed * math.sin(heading + beta)
+    dh = dt * forward_speed * math.tan(steering_angle) * math.cos(beta) / auv_length
+    return dx, dy, dh
+
+
+@njit(cache=True, fastmath=True)
+def swath_quad_strip(t, swath):
+    # t is an (N,3) array of (x, y, heading) poses
+    # builds the coverage quad strip: the right swath edge followed by
+    # the reversed left edge, ready to be used as a closed polygon
+    n = t.shape[0]
+    out = np.empty((2*n, 2))
+    half = swath / 2.0
+    for i in range(n):
+        x = t[i, 0]
+        y = t[i, 1]
+        h = t[i, 2]
+        # (0, -half) and (0, half) rotated by the heading
+        ox = half * math.sin(h)
+        oy = half * math.cos(h)
+        out[i, 0] = x + ox
+        out[i, 1] = y - oy
+        out[2*n-1-i, 0] = x - ox
+        out[2*n-1-i, 1] = y + oy
+    return out
+
+
+@njit(cache=True, fastmath=True, nogil=True)
+def lawnmower_path_points(start_x, start_y, num_hooks, hook_len, swath,
+                          overlap_between_lanes, flip_y, flip_x):
+    # the hook pattern of the lawnmower planner, unrolled into one
+    # preallocated array: the start point plus 4 points per hook.
+    # each hook continues from the last point of the previous one
+    n = 1 + 4*num_hooks
+    out = np.empty((n, 2))
+    side = -1.0 if flip_y else 1.0
+    direction = -1.0 if flip_x else 1.0
+    o = overlap_between_lanes / 2.0
+    x = start_x
+    y = start_y
+    out[0, 0] = x
+    out[0, 1] = y
+    k = 1
+    for hook_i in range(num_hooks):
+        out[k, 0] = x
+        out[k, 1] = y + side*hook_len
+        out[k+1, 0] = x + direction*swath - o
+        out[k+1, 1] = y + side*hook_len
+        out[k+2, 0] = x + direction*swath - o
+        out[k+2, 1] = y
+        out[k+3, 0] = x + direction*2*swath - 2*o
+        out[k+3, 1] = y
+        x = out[k+3, 0]
+        y = out[k+3, 1]
+        k += 4
+    return out
+
+
+@njit(cache=True, nogil=True)
+def stamp_disks(img, xs, ys, radii, value):
+    # saturating-add stamp of filled disks into a uint8 image,
+    # coordinates and radii in pixels. a whole plan rasterizes in one
+    # call without any plotting machinery involved
+    h, w = img.shape
+    for i in range(len(xs)):
+        cx = xs[i]
+        cy = ys[i]
+        r = radii[i]
+        r2 = r*r
+        y0 = max(0, int(cy - r))
+        y1 = min(h - 1, int(cy + r))
+        x0 = max(0, int(cx - r))
+        x1 = min(w - 1, int(cx + r))
+        for py in range(y0, y1 + 1):
+            dy = py - cy
+            for px in range(x0, x1 + 1):
+                dx = px - cx
+                if dx*dx + dy*dy <= r2:
+                    v = np.int64(img[py, px]) + value
+                    if v > 255:
+                        v = 255
+                    img[py, px] = v
+
+
+@njit(cache=True, fastmath=True)
+def euclid_distance_sq_2d(ax, ay, bx, by):
+    # for comparing against a constant threshold, compare against
+    # the squared threshold instead and skip the sqrt
+    dx = ax - bx
+    dy = ay - by
+    return dx*dx + dy*dy
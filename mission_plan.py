@@ -7,9 +7,13 @@
 import numpy as np
 import dubins
 
+from copy import deepcopy
+from functools import lru_cache
+
+from fast_geometry import lawnmower_path_points
 from toolbox import geometry as geom #This is the custom toolbox package found at this repo https://github.com/KKalem/toolbox. Don't forget to add it to your python path by adding this to your .bashrc: export PYTHONPATH="${PYTHONPATH}:/path/to/toolbox"
 
-import matplotlib.patches as pltpatches
+from matplotlib.collections import EllipseCollection
 
 
 class TimedWaypoint(object):
@@ -34,6 +38,8 @@ class TimedWaypoint(object):
         assert position_in_line in [TimedWaypoint.FIRST, TimedWaypoint.MIDDLE, TimedWaypoint.LAST]
         self.position_in_line = position_in_line
         self.uncertainty_radius = uncertainty_radius
+        # for the squared-distance checks agents do against this wp
+        self.uncertainty_radius_sq = uncertainty_radius**2
         self.uncertainty_radius_before_loop_closure = uncertainty_radius_before_loop_closure
         self.idx_in_pattern = idx_in_pattern
 
@@ -151,10 +157,17 @@ class TimedPath(object):
     def visualize(self, ax, wp_labels=False, circles=False, alpha=0.2, c=None):
         ax.plot(self.xs, self.ys, alpha=alpha+0.2, linestyle=':', c=c)
 
+        if circles and c is None:
+            c = 'blue'
+
+        arrows = []
+        centers = []
+        radii = []
+        pre_loop_radii = []
         for wp in self.wps:
             if wp.position_in_line != TimedWaypoint.MIDDLE:
                 x,y,ux,uy = wp.arrow()
-                ax.arrow(x,y,ux*3,uy*3, color=c, alpha=alpha*2)
+                arrows.append((x, y, ux*3, uy*3))
 
                 if wp_labels:
                     if wp.idx_in_pattern is not None:
@@ -164,23 +177,97 @@ class TimedPath(object):
 
 
                 if circles:
-                    if c is None:
-                        c = 'blue'
-
-                    ax.add_patch(pltpatches.Circle((x,y),
-                                                   radius=wp.uncertainty_radius,
-                                                   ec=c,
-                                                   fc=c,
-                                                   alpha=alpha))
+                    centers.append((x, y))
+                    radii.append(wp.uncertainty_radius)
+                    pre_loop_radii.append(wp.uncertainty_radius_before_loop_closure)
                     # ax.text(x+5, y-5, f'r={str(wp.uncertainty_radius)[:5]}')
-                    if wp.uncertainty_radius_before_loop_closure is not None:
-                        ax.add_patch(pltpatches.Circle((x,y),
-                                                       radius=wp.uncertainty_radius_before_loop_closure,
-                                                       ec=c,
-                                                       fc=c,
-                                                       alpha=alpha*0.5))
 
+        if len(arrows) > 0:
+            # one quiver for all the heading arrows instead of a
+            # FancyArrow patch per waypoint
+            ar = np.asarray(arrows)
+            ax.quiver(ar[:,0], ar[:,1], ar[:,2], ar[:,3],
+                      color=c if c is not None else 'C0',
+                      alpha=min(alpha*2, 1.0),
+                      angles='xy', scale_units='xy', scale=1.)
+
+        if circles and len(centers) > 0:
+            # all the circles go in as one collection each instead of
+            # one patch per waypoint, so matplotlib batches the draw
+            diams = 2*np.asarray(radii, dtype=float)
+            ax.add_collection(EllipseCollection(widths=diams,
+                                                heights=diams,
+                                                angles=0,
+                                                units='xy',
+                                                offsets=centers,
+                                                offset_transform=ax.transData,
+                                                ec=c,
+                                                fc=c,
+                                                alpha=alpha))
+            with_pre = [(xy, r) for xy, r in zip(centers, pre_loop_radii)
+                        if r is not None]
+            if len(with_pre) > 0:
+                pre_diams = 2*np.asarray([r for xy, r in with_pre], dtype=float)
+                ax.add_collection(EllipseCollection(widths=pre_diams,
+                                                    heights=pre_diams,
+                                                    angles=0,
+                                                    units='xy',
+                                                    offsets=[xy for xy, r in with_pre],
+                                                    offset_transform=ax.transData,
+                                                    ec=c,
+                                                    fc=c,
+                                                    alpha=alpha*0.5))
+
+
+
+
+class MultiTimedPath(object):
+    def __init__(self, xs, ys, headings, times, dtype=np.float32):
+        """
+        Structure-of-arrays view over many equal-length paths.
+        xs, ys, headings, times are all (num_agents, num_wps) arrays,
+        so downstream metrics (distances, coverage integrals...) can be
+        computed across every agent in one vectorized expression
+        instead of walking lists of waypoint objects.
+        Stored as float32 by default: meter-level coordinates dont need
+        the precision and the halved memory traffic matters once the
+        waypoint counts get large. Reductions still accumulate in
+        float64.
+        """
+        self.xs = np.asarray(xs, dtype=dtype)
+        self.ys = np.asarray(ys, dtype=dtype)
+        self.headings = np.asarray(headings, dtype=dtype)
+        self.times = np.asarray(times, dtype=dtype)
+
+    @classmethod
+    def from_timed_paths(cls, timed_paths):
+        """
+        Stack a list of equal-length TimedPaths into one MultiTimedPath
+        """
+        return cls(xs = [tp.xs for tp in timed_paths],
+                   ys = [tp.ys for tp in timed_paths],
+                   headings = [tp.headings for tp in timed_paths],
+                   times = [tp.times for tp in timed_paths])
+
+    def __len__(self):
+        return self.xs.shape[0]
+
+    @property
+    def num_wps(self):
+        return self.xs.shape[1]
+
+    @property
+    def total_distances(self):
+        # per-agent path length, one vectorized pass over all agents.
+        # the per-segment math stays in the storage dtype, only the
+        # accumulation is widened to float64
+        return np.sum(np.hypot(np.diff(self.xs, axis=1),
+                               np.diff(self.ys, axis=1)),
+                      axis=1, dtype=np.float64)
 
+    def visualize(self, ax, alpha=0.2, c=None):
+        # rows are agents, matplotlib plots one line per column set
+        ax.plot(self.xs.T, self.ys.T, alpha=alpha+0.2, linestyle=':', c=c)
 
 
 
@@ -200,6 +287,11 @@ def plan_simple_lawnmower(num_agents,
     # the dubins planner to be the 'true' one and rotate the simple plan after its constructed
     # width determines hook_len, height determines num_hooks.
     # hook_len = (rect_width + (num_agents-1 * overlap_between_rows)) / num_agents
+    # a degenerate rectangle or a swath swallowed by its own overlap
+    # covers nothing, skip the whole construction
+    if rect_width <= 0 or rect_height <= 0 or swath <= overlap_between_lanes:
+        return [TimedPath([]) for i in range(num_agents)]
+
     hook_len = (rect_width/num_agents) + overlap_between_rows/2
     num_hooks = int(np.ceil((rect_height / ((swath-overlap_between_lanes)*2))))
 
@@ -215,72 +307,139 @@ def plan_simple_lawnmower(num_agents,
                                       exiting_line=exiting_line)
 
     # this goes from left to right, i want it to go bottom up.
-    for i in range(len(paths)):
-        pr = geom.vec2_rotate(paths[i], np.pi/2)
-        paths[i] = pr
+    # all the paths have the same length, so stack them and rotate
+    # 90deg ccw in one op: (x,y) -> (-y,x)
+    paths = np.asarray(paths, dtype=float)
+    paths = np.stack([-paths[:, :, 1], paths[:, :, 0]], axis=2)
 
     # and then move the bottom left to be 0,0
-    mins = np.min(paths, axis=1)
-    minx, miny = np.min(mins, axis=0)
+    minx = np.min(paths[:, :, 0])
+    miny = np.min(paths[:, :, 1])
     # but also move the miny half a swath up for coverage
     # miny -= swath/2 #Generate path from origin
 
-    for i in range(len(paths)):
-        paths[i][:,0] -= minx
-        paths[i][:,1] -= miny
+    paths[:, :, 0] -= minx
+    paths[:, :, 1] -= miny
 
-    # and now create a timed path out of these points
+    # and now create a timed path out of these points.
+    # distances, times and headings for a whole path come out of a few
+    # vectorized passes, the loop below only wraps them into objects
     timed_paths = []
     for path in paths:
-        init_posi = np.array(path[0])
-        second_posi = np.array(path[1])
-        vec = second_posi - init_posi
-        init_heading = np.arctan2(vec[1], vec[0])
-        wp = TimedWaypoint(pose = list(path[0]) + [init_heading],
-                           time = 0,
-                           line_idx = 0,
-                           position_in_line = TimedWaypoint.FIRST)
-
-        timed_path = TimedPath([wp])
+        n = len(path)
+        segs = np.diff(path, axis=0)
+        dists = np.hypot(segs[:, 0], segs[:, 1])
+        times = np.empty(n)
+        times[0] = 0.
+        np.cumsum(dists/speed + straight_slack, out=times[1:])
+        seg_headings = np.arctan2(segs[:, 1], segs[:, 0])
+        # even poses are firsts, odds are lasts
+        # in this lawnmower, there are no mids.
+        # firsts point at the next wp, lasts keep the previous heading
+        # (a trailing FIRST shouldnt ever happen, but keep its heading 0)
+        headings = np.zeros(n)
+        headings[0:n-1:2] = seg_headings[0:n-1:2]
+        odd = headings[1::2]
+        odd[:] = headings[0::2][:len(odd)]
+
+        wps = []
         current_line_idx = 0
-        for i in range(1, len(path)):
-            # at 1,3,5... start a new line
-            if i-1%2 == 0:
+        for i in range(n):
+            if i > 0 and i-1%2 == 0:
+                # at 1,3,5... start a new line
                 current_line_idx += 1
-
-            prev_wp = timed_path.wps[i-1]
-            dist = geom.euclid_distance(prev_wp.pose[:2], path[i])
-
-            # even poses are firsts, odds are lasts
-            # in this lawnmower, there are no mids
             if i%2 == 0:
                 posi = TimedWaypoint.FIRST
-                # then the heading is towards the next point
-                if i+1 < len(path):
-                    next_posi = path[i+1][:2]
-                    current_posi = path[i][:2]
-                    heading_vec = next_posi - current_posi
-                    heading_angle = np.arctan2(heading_vec[1], heading_vec[0])
-                else:
-                    # might be the last point, shouldnt ever happen if its a FIRST
-                    # but still handle
-                    heading_angle = 0.
             else:
                 posi = TimedWaypoint.LAST
-                # heading is same as previous point
-                heading_angle = prev_wp.pose[2]
-
-            wp = TimedWaypoint(pose = list(path[i]) + [heading_angle],
-                               time = prev_wp.time + dist/speed + straight_slack,
-                               line_idx = current_line_idx,
-                               position_in_line = posi)
-
-            timed_path.append(wp)
-        timed_paths.append(timed_path)
+            wps.append(TimedWaypoint(pose = list(path[i]) + [headings[i]],
+                                     time = times[i],
+                                     line_idx = current_line_idx,
+                                     position_in_line = posi))
+        timed_paths.append(TimedPath(wps))
 
     return timed_paths
 
 
+@lru_cache(maxsize=128)
+def _plan_simple_lawnmower_cached(num_agents,
+                                  swath,
+                                  rect_width,
+                                  rect_height,
+                                  speed,
+                                  straight_slack,
+                                  overlap_between_rows,
+                                  overlap_between_lanes,
+                                  double_sided,
+                                  center_x,
+                                  center_y,
+                                  exiting_line):
+    return plan_simple_lawnmower(num_agents,
+                                 swath,
+                                 rect_width,
+                                 rect_height,
+                                 speed,
+                                 straight_slack,
+                                 overlap_between_rows,
+                                 overlap_between_lanes,
+                                 double_sided,
+                                 center_x,
+                                 center_y,
+                                 exiting_line)
+
+
+def plan_simple_lawnmower_cached(num_agents,
+                                 swath,
+                                 rect_width,
+                                 rect_height,
+                                 speed,
+                                 straight_slack = 1,
+                                 overlap_between_rows=0,
+                                 overlap_between_lanes=0,
+                                 double_sided=False,
+                                 center_x=False,
+                                 center_y=False,
+                                 exiting_line=False):
+    """
+    Memoized plan_simple_lawnmower for repeated identical parameters.
+    All the arguments are hashable scalars, so repeated calls are one
+    real planning pass and then cache lookups. The missions mutate the
+    waypoints they are given (visits, rendezvous flags), so each caller
+    gets a deep copy of the cached plan.
+    """
+    timed_paths = _plan_simple_lawnmower_cached(num_agents,
+                                                swath,
+                                                rect_width,
+                                                rect_height,
+                                                speed,
+                                                straight_slack,
+                                                overlap_between_rows,
+                                                overlap_between_lanes,
+                                                double_sided,
+                                                center_x,
+                                                center_y,
+                                                exiting_line)
+    return deepcopy(timed_paths)
+
+
+def plan_simple_lawnmower_batch(param_rows, **common_kwargs):
+    """
+    Plan a whole sweep of lawnmower configurations in one call.
+    param_rows is an iterable of (num_agents, swath, rect_width,
+    rect_height, speed) rows; any further planner arguments passed as
+    keywords apply to every row. Returns one list of TimedPaths per
+    row, in order. Repeated rows in the sweep hit the plan cache.
+    """
+    results = []
+    for num_agents, swath, rect_width, rect_height, speed in param_rows:
+        results.append(plan_simple_lawnmower_cached(int(num_agents),
+                                                    swath,
+                                                    rect_width,
+                                                    rect_height,
+                                                    speed,
+                                                    **common_kwargs))
+    return results
+
 
 def construct_lawnmower_paths(num_agents,
                               num_hooks,
@@ -294,33 +453,17 @@ def construct_lawnmower_paths(num_agents,
                               exiting_line = True):
     assert num_agents%2==0 or not double_sided, "There must be even number of agents for a double-sided lawnmower plan!"
 
-    def make_hook(flip_y = False, flip_x = False):
-        side = 1
-        if flip_y:
-            side = -1
-
-        direction = 1
-        if flip_x:
-            direction = -1
-
-        o = overlap_between_lanes /2.
-        p1 = [0, side*hook_len]
-        p2 = [direction*swath - o, side*hook_len]
-        p3 = [direction*swath - o, 0]
-        p4 = [direction*2*swath - 2*o, 0]
-        return np.array([p1, p2, p3, p4])
-
     def make_lawnmower_path(starting_pos, flip_y=False, flip_x=False):
-        path = [starting_pos]
-        for hook_i in range(num_hooks):
-            if hook_i>=1:
-                starting_pos = path[-1]
-
-            hook = make_hook(flip_y, flip_x)
-            hook += starting_pos
-            path.extend(hook)
-
-        return np.array(path)
+        # the hook-by-hook point generation lives in a jitted kernel,
+        # which writes the whole path into one preallocated array
+        return lawnmower_path_points(float(starting_pos[0]),
+                                     float(starting_pos[1]),
+                                     num_hooks,
+                                     float(hook_len),
+                                     float(swath),
+                                     float(overlap_between_lanes),
+                                     flip_y,
+                                     flip_x)
 
     paths = []
     flip_x = False
@@ -333,29 +476,28 @@ def construct_lawnmower_paths(num_agents,
 
     for side in range(num_sides):
         flip_x = side%2==1
-        for agent_i in range(num_agents_side):
-            flip_y = True
-            if agent_i%2 == 0:
-                flip_y = False
-
-            if agent_i >= 1:
-                pos  = paths[-1][0].copy()
-                if flip_y:
-                    pos[1] += 2*hook_len+gap_between_rows
-                else:
-                    pos[1] += gap_between_rows
+
+        # the starting positions have a closed form: x is constant for
+        # the whole side (the other agents copy the first one, which
+        # gets nudged half a swath on double-sided plans) and y climbs
+        # by 2*hook_len+gap on flipped agents, just the gap otherwise
+        start_x = swath
+        if double_sided:
+            if flip_x:
+                start_x -= swath/2
             else:
-                pos  = np.array([swath, swath])
+                start_x += swath/2
 
-            # the other agents copy the position of the
-            # first one, so we just need to adjust the first one
-            if double_sided and agent_i == 0:
-                if flip_x:
-                    pos[0] -= swath/2
-                else:
-                    pos[0] += swath/2
+        flips = np.arange(num_agents_side)%2 == 1
+        increments = np.where(flips,
+                              2*hook_len + gap_between_rows,
+                              gap_between_rows)
+        start_ys = swath + np.concatenate(([0.], np.cumsum(increments[1:])))
 
-            path = make_lawnmower_path(pos , flip_y, flip_x)
+        for agent_i in range(num_agents_side):
+            path = make_lawnmower_path(np.array([start_x, start_ys[agent_i]]),
+                                       flips[agent_i],
+                                       flip_x)
             paths.append(path)
 
     paths = np.array(paths)
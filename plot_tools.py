@@ -0,0 +1,29 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+
+import numpy as np
+from matplotlib.path import Path
+from matplotlib.patches import PathPatch
+
+
+def polygon_patch(poly, **kwargs):
+    """
+    build a matplotlib PathPatch straight from the vertices of a shapely
+    (multi)polygon, exterior and holes included. does what descartes'
+    PolygonPatch did, without going through its per-vertex wrappers
+    """
+    polies = getattr(poly, 'geoms', [poly])
+    verts = []
+    codes = []
+    for p in polies:
+        for ring in [p.exterior] + list(p.interiors):
+            pts = np.asarray(ring.coords)
+            ring_codes = np.full(len(pts), Path.LINETO, dtype=Path.code_type)
+            ring_codes[0] = Path.MOVETO
+            ring_codes[-1] = Path.CLOSEPOLY
+            verts.append(pts)
+            codes.append(ring_codes)
+
+    path = Path(np.concatenate(verts), np.concatenate(codes))
+    return PathPatch(path, **kwargs)
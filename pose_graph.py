@@ -4,6 +4,8 @@
 # Ozer Ozkahraman (ozero@kth.se)
 
 
+import threading
+
 import numpy as np
 import g2o
 from toolbox import geometry as geom
@@ -260,14 +262,18 @@ class PGO_VertexIdStore(object):
     def __init__(self):
         self.ids = []
         self.origin_id = 0
+        # the store is shared by every graph in a mission, so id
+        # creation must be safe when agents update in parallel
+        self._lock = threading.Lock()
 
     def get_new_id(self):
-        if len(self.ids) > 0:
-            new_id = self.ids[-1]+1
-        else:
-            new_id = 1
-        self.ids.append(new_id)
-        return new_id
+        with self._lock:
+            if len(self.ids) > 0:
+                new_id = self.ids[-1]+1
+            else:
+                new_id = 1
+            self.ids.append(new_id)
+            return new_id
 
 
 class OdomEdge(object):
@@ -953,6 +959,10 @@ class PoseGraph(object):
         our last known tip.
         """
         start_vert = self.other_odom_tip_vertices.get(other_pg.pg_id)
+        # if their tip hasnt moved since we last talked, there is
+        # nothing new to fill in, dont walk their chain at all
+        if start_vert is not None and start_vert is other_pg.odom_tip_vertex:
+            return 0, 0
         # from the previously known latest vertex to whatever tip the other pg has
         # this is where we can measure bandwidth requirement too
         # self.log(f"Getting data from {other_pg.pg_id}")
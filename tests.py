@@ -1,29 +1,131 @@
+import hashlib
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from copy import deepcopy
+from functools import partial
+
+import numpy as np
+
+import matplotlib
+if os.environ.get('DISPLAY', '') == '':
+    # no display to show() on, render straight to a file instead
+    matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+from fast_geometry import stamp_disks
 from mission_plan import *
 
 # Your existing code here
 
-def generate_waypoints_for_multiple_auvs(num_agents, swath, rect_width, rect_height, speed, straight_slack=1, overlap_between_rows=0, overlap_between_lanes=0, double_sided=False, center_x=False, center_y=False, exiting_line=False):
-    timed_paths_list = []
-    for auv_id in range(num_agents):
-        timed_paths = plan_simple_lawnmower(
-            num_agents=1,  # Plan for one AUV at a time
-            swath=swath,
-            rect_width=rect_width,
-            rect_height=rect_height,
-            speed=speed,
-            straight_slack=straight_slack,
-            overlap_between_rows=overlap_between_rows,
-            overlap_between_lanes=overlap_between_lanes,
-            double_sided=double_sided,
-            center_x=center_x,
-            center_y=center_y,
-            exiting_line=exiting_line
-        )
-        timed_paths_list.append(timed_paths[0])  # Extract the single AUV's path
+def _plan_single_auv(auv_id, planner_kwargs):
+    # module-level so it can be pickled into worker processes.
+    # the cached planner makes repeated identical geometries (like this
+    # loop, which plans the same single-AUV path N times) free after
+    # the first call
+    timed_paths = plan_simple_lawnmower_cached(
+        num_agents=1,  # Plan for one AUV at a time
+        **planner_kwargs
+    )
+    return timed_paths[0]  # Extract the single AUV's path
+
+def generate_waypoints_for_multiple_auvs(num_agents, swath, rect_width, rect_height, speed, straight_slack=1, overlap_between_rows=0, overlap_between_lanes=0, double_sided=False, center_x=False, center_y=False, exiting_line=False, parallel=False, use_threads=False, as_struct=False):
+    planner_kwargs = dict(
+        swath=swath,
+        rect_width=rect_width,
+        rect_height=rect_height,
+        speed=speed,
+        straight_slack=straight_slack,
+        overlap_between_rows=overlap_between_rows,
+        overlap_between_lanes=overlap_between_lanes,
+        double_sided=double_sided,
+        center_x=center_x,
+        center_y=center_y,
+        exiting_line=exiting_line
+    )
+
+    # every per-AUV plan is independent, so big fleets can be planned on
+    # separate cores. spawning processes costs more than a handful of
+    # plans, so small fleets stay on the sequential path. the planner
+    # spends its time in numpy/numba which release the GIL, so threads
+    # (no fork/spawn or argument pickling) are usually the cheaper pool
+    if parallel and num_agents >= 4:
+        plan_one = partial(_plan_single_auv, planner_kwargs=planner_kwargs)
+        if use_threads:
+            pool = ThreadPoolExecutor(max_workers=min(num_agents, os.cpu_count() or 1))
+        else:
+            pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+        with pool as executor:
+            # map preserves the auv_id ordering
+            timed_paths_list = list(executor.map(plan_one, range(num_agents)))
+        if as_struct:
+            # stacked (num_agents, num_wps) arrays for vectorized consumers
+            return MultiTimedPath.from_timed_paths(timed_paths_list)
+        return timed_paths_list
+
+    if num_agents <= 0:
+        return []
+
+    # every iteration planned the exact same single-AUV path, so plan
+    # it once and hand out independent copies instead of re-invoking
+    # the planner per AUV
+    base_path = _plan_single_auv(0, planner_kwargs)
+    # result slots preallocated and filled by index, no list resizing
+    timed_paths_list = [None] * num_agents
+    timed_paths_list[0] = base_path
+    for auv_id in range(1, num_agents):
+        timed_paths_list[auv_id] = deepcopy(base_path)
 
+    if as_struct:
+        # stacked (num_agents, num_wps) arrays for vectorized consumers
+        return MultiTimedPath.from_timed_paths(timed_paths_list)
     return timed_paths_list
 
+def dump_paths_memmap(timed_paths_list, out_path='wps.dat'):
+    # stream the planned geometry into a disk-backed (N, M, 3) array of
+    # (x, y, heading) rows. later consumers (plots, coverage metrics,
+    # other processes) mmap-read the file and never touch the waypoint
+    # python objects again
+    num_paths = len(timed_paths_list)
+    num_wps = len(timed_paths_list[0].wps)
+    wps = np.memmap(out_path, dtype=np.float64, mode='w+',
+                    shape=(num_paths, num_wps, 3))
+    for i, tp in enumerate(timed_paths_list):
+        wps[i, :, 0] = tp.xs
+        wps[i, :, 1] = tp.ys
+        wps[i, :, 2] = tp.headings
+    wps.flush()
+    return wps
+
+def rasterize_paths_png(timed_paths_list, swath, out_path='paths.png', px_per_meter=0.5):
+    # draw the swath disks straight into a numpy image and write it as
+    # a png, skipping matplotlib's artist pipeline entirely. for plans
+    # with very many waypoints this is orders of magnitude faster than
+    # rendering one patch (or even one collection) per path
+    from PIL import Image
+
+    all_x = np.concatenate([np.asarray(tp.xs, dtype=float) for tp in timed_paths_list])
+    all_y = np.concatenate([np.asarray(tp.ys, dtype=float) for tp in timed_paths_list])
+    margin = swath
+    minx = all_x.min() - margin
+    maxy = all_y.max() + margin
+    width_px = int((all_x.max() + margin - minx) * px_per_meter) + 1
+    height_px = int((maxy - (all_y.min() - margin)) * px_per_meter) + 1
+
+    img = np.zeros((height_px, width_px), dtype=np.uint8)
+    radius_px = max(1.0, (swath/2.) * px_per_meter)
+    for tp in timed_paths_list:
+        xs = (np.asarray(tp.xs, dtype=float) - minx) * px_per_meter
+        # image rows grow downwards, world y grows upwards
+        ys = (maxy - np.asarray(tp.ys, dtype=float)) * px_per_meter
+        radii = np.full(len(xs), radius_px)
+        stamp_disks(img, xs, ys, radii, 40)
+
+    # white background, darker where more swaths overlap
+    Image.fromarray(255 - img).save(out_path)
+    return out_path
+
+
 if __name__ == '__main__':
     # Example configuration
     num_agents = 6
@@ -56,27 +158,65 @@ if __name__ == '__main__':
     #     exiting_line=exiting_line
     # )
 
-    timed_paths_list = plan_simple_lawnmower(
-        num_agents=num_agents,
-        swath=swath,
-        rect_width=rect_width,
-        rect_height=rect_height,
-        speed=speed,
-        straight_slack=straight_slack,
-        overlap_between_rows=overlap_between_rows,
-        overlap_between_lanes=overlap_between_lanes,
-        double_sided=double_sided,
-        center_x=center_x,
-        center_y=center_y,
-        exiting_line=exiting_line
-    )
+    # the plan is deterministic in its parameters, so cache it on disk
+    # and make repeated runs of this script skip the planning entirely
+    params = (num_agents, swath, rect_width, rect_height, speed,
+              straight_slack, overlap_between_rows, overlap_between_lanes,
+              double_sided, center_x, center_y, exiting_line)
+    key = hashlib.blake2b(repr(params).encode()).hexdigest()[:16]
+    cache_dir = '.plan_cache'
+    cache_file = os.path.join(cache_dir, f'{key}.pkl')
+
+    if os.path.exists(cache_file):
+        with open(cache_file, 'rb') as f:
+            timed_paths_list = pickle.load(f)
+        print(f"Loaded cached plan from {cache_file}")
+    else:
+        timed_paths_list = plan_simple_lawnmower(
+            num_agents=num_agents,
+            swath=swath,
+            rect_width=rect_width,
+            rect_height=rect_height,
+            speed=speed,
+            straight_slack=straight_slack,
+            overlap_between_rows=overlap_between_rows,
+            overlap_between_lanes=overlap_between_lanes,
+            double_sided=double_sided,
+            center_x=center_x,
+            center_y=center_y,
+            exiting_line=exiting_line
+        )
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(cache_file, 'wb') as f:
+            pickle.dump(timed_paths_list, f)
+        print(f"Cached plan to {cache_file}")
 
     # Visualization
     fig = plt.figure()
     ax = fig.add_subplot(111, aspect='equal')
 
-    for timed_paths in timed_paths_list:
-        timed_paths.visualize(ax, wp_labels=False, circles=True, alpha=0.1, c='k')
+    total_wps = sum(len(tp.wps) for tp in timed_paths_list)
+    if total_wps > 100000:
+        # plans this big choke on per-waypoint artists and python
+        # objects. dump the geometry to a disk-backed array and draw
+        # every segment of every path as one LineCollection
+        wps = dump_paths_memmap(timed_paths_list)
+        segs = np.stack([wps[:, :-1, :2], wps[:, 1:, :2]],
+                        axis=2).reshape(-1, 2, 2)
+        ax.add_collection(LineCollection(segs, colors='k', alpha=0.1,
+                                         linewidths=1))
+        ax.autoscale_view()
+    else:
+        for timed_paths in timed_paths_list:
+            timed_paths.visualize(ax, wp_labels=False, circles=True, alpha=0.1, c='k')
 
-    plt.show()
-    
\ No newline at end of file
+    if matplotlib.get_backend().lower() == 'agg':
+        if total_wps > 20000:
+            # matplotlib chokes on plans this big, rasterize directly
+            out = rasterize_paths_png(timed_paths_list, swath)
+            print(f"Saved {out}")
+        else:
+            fig.savefig('paths.png', dpi=100)
+            print("Saved paths.png")
+    else:
+        plt.show()